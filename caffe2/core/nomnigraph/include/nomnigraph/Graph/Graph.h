@@ -14,6 +14,7 @@
 #include <algorithm>
 #include <iterator>
 #include <list>
+#include <memory>
 #include <unordered_set>
 #include <vector>
 
@@ -257,6 +258,8 @@ class Graph {
         destNodes.splice(destNodes.end(), nodes_, it);
         nodeRefs_.erase(node);
         destGraph->nodeRefs_.insert(node);
+        nodesSnapshot_.reset();
+        destGraph->nodesSnapshot_.reset();
         break;
       }
     }
@@ -290,6 +293,8 @@ class Graph {
         destNodes.splice(destNodes.end(), nodes_, it--);
         nodeRefs_.erase(node);
         destGraph->nodeRefs_.insert(node);
+        nodesSnapshot_.reset();
+        destGraph->nodesSnapshot_.reset();
         sg.removeNode(node);
       }
     }
@@ -469,6 +474,7 @@ class Graph {
       if (&*i == n) {
         nodeRefs_.erase(n);
         nodes_.erase(i);
+        nodesSnapshot_.reset();
         break;
       }
     }
@@ -507,6 +513,18 @@ class Graph {
     return result;
   }
 
+  /// \brief Returns the nodes of the graph as a shared, immutable snapshot.
+  /// The snapshot is cached until nodes are created, deleted or moved, so
+  /// repeated scans of a graph whose node set is unchanged (e.g. matching
+  /// after a pass that only rewired edges) skip the list traversal.
+  std::shared_ptr<const std::vector<NodeRef>> getNodesSnapshot() {
+    if (!nodesSnapshot_) {
+      nodesSnapshot_ =
+          std::make_shared<const std::vector<NodeRef>>(getMutableNodes());
+    }
+    return nodesSnapshot_;
+  }
+
   size_t getNodesCount() const {
     return (size_t)nodes_.size();
   }
@@ -528,12 +546,15 @@ class Graph {
   std::list<Node<T, U...>> nodes_;
   std::list<Edge<T, U...>> edges_;
   std::unordered_set<NodeRef> nodeRefs_;
+  // Cached result of getNodesSnapshot(), reset whenever nodes_ changes.
+  std::shared_ptr<const std::vector<NodeRef>> nodesSnapshot_;
 
   NodeRef createNodeInternal(Node<T, U...>&& node) {
     nodes_.emplace_back(std::move(node));
     NodeRef nodeRef = &nodes_.back();
     DEBUG_PRINT("Creating node (%p)\n", nodeRef);
     nodeRefs_.insert(nodeRef);
+    nodesSnapshot_.reset();
     return nodeRef;
   }
 
@@ -259,6 +259,35 @@ struct SubgraphMatcher {
   }
 
  private:
+  // Cheap look-ahead run before the node criteria and any recursion: each
+  // child criteria consumes exactly its count of edges, or any number of
+  // edges for a * pattern, and every edge of the root must be consumed.
+  // A root whose edge count falls outside that range can never match.
+  static bool hasFeasibleEdgeCount(
+      typename GraphType::NodeRef root,
+      const MatchNodeRef<NodeMatchCriteria>& rootCriteriaRef,
+      bool invertGraphTraversal) {
+    const auto& criteriaEdges = invertGraphTraversal
+        ? rootCriteriaRef->getInEdges()
+        : rootCriteriaRef->getOutEdges();
+    size_t requiredEdges = 0;
+    bool hasStarCount = false;
+    for (const auto& criteriaEdge : criteriaEdges) {
+      auto childrenCriteriaRef = invertGraphTraversal ? criteriaEdge->tail()
+                                                      : criteriaEdge->head();
+      int count = childrenCriteriaRef->data().getCount();
+      if (count == MatchNode<NodeMatchCriteria>::kStarCount) {
+        hasStarCount = true;
+      } else {
+        requiredEdges += count;
+      }
+    }
+    size_t numEdges = invertGraphTraversal ? root->getInEdges().size()
+                                           : root->getOutEdges().size();
+    return hasStarCount ? numEdges >= requiredEdges
+                        : numEdges == requiredEdges;
+  }
+
   static SubgraphMatchResultType isSubgraphMatchInternal(
       std::shared_ptr<typename SubgraphMatchResultType::MatchNodeMap>
           matchedNodes,
@@ -292,6 +321,21 @@ struct SubgraphMatcher {
       }
     }
 
+    if (!rootCriteriaNode.isNonTerminal() &&
+        !hasFeasibleEdgeCount(root, rootCriteriaRef, invertGraphTraversal)) {
+      if (debug) {
+        std::ostringstream debugMessage;
+        debugMessage << "Subgraph root at " << root
+                     << " has a number of children that cannot satisfy "
+                     << "criteria "
+                     << debugString<NodeMatchCriteria>(
+                            rootCriteriaRef, invertGraphTraversal);
+        return SubgraphMatchResultType::notMatched(debugMessage.str());
+      } else {
+        return SubgraphMatchResultType::notMatched();
+      }
+    }
+
     if (!isNodeMatch(root, rootCriteriaNode.getCriteria())) {
       if (debug) {
         std::ostringstream debugMessage;
@@ -130,6 +130,32 @@ TEST(Basic, HasNode) {
   EXPECT_TRUE(g.hasNode(n5));
 }
 
+TEST(Basic, NodesSnapshot) {
+  TestGraph g;
+  auto n1 = createTestNode(g);
+  auto n2 = createTestNode(g);
+  auto s1 = g.getNodesSnapshot();
+  EXPECT_EQ(s1->size(), 2);
+  // Rewiring edges leaves the node set, and thus the snapshot, unchanged.
+  g.createEdge(n1, n2);
+  EXPECT_EQ(g.getNodesSnapshot(), s1);
+  auto n3 = createTestNode(g);
+  auto s2 = g.getNodesSnapshot();
+  EXPECT_NE(s2, s1);
+  EXPECT_EQ(s2->size(), 3);
+  // Snapshots handed out earlier are not affected by later mutations.
+  EXPECT_EQ(s1->size(), 2);
+  g.deleteNode(n3);
+  EXPECT_EQ(g.getNodesSnapshot()->size(), 2);
+
+  TestGraph g2;
+  auto n4 = createTestNode(g2);
+  EXPECT_EQ(g2.getNodesSnapshot()->size(), 1);
+  g2.moveNode(n4, &g);
+  EXPECT_EQ(g2.getNodesSnapshot()->size(), 0);
+  EXPECT_EQ(g.getNodesSnapshot()->size(), 3);
+}
+
 TEST(Basic, Moves) {
   TestGraph g;
   auto n1 = createTestNode(g);
@@ -383,6 +383,35 @@ TEST(SubgraphMatcher, IsSubtreeMatchRepeated) {
   // clang-format on
 }
 
+// Test that roots with an impossible number of children are rejected by the
+// edge count look-ahead before the children are explored.
+TEST(SubgraphMatcher, EdgeCountLookAhead) {
+  TestGraph graph;
+  auto n1 = graph.createNode("1");
+  auto n2 = graph.createNode("2");
+  auto n3 = graph.createNode("3");
+  graph.createEdge(n1, n2);
+  graph.createEdge(n1, n3);
+
+  reset();
+  auto subtree = Tree(Criteria("1"), {Tree(any())});
+  auto result = TestMatcher::isSubgraphMatch(n1, subtree, false, true);
+  EXPECT_FALSE(result.isMatch());
+  EXPECT_NE(
+      result.getDebugMessage().find("cannot satisfy criteria"),
+      std::string::npos);
+
+  reset();
+  subtree = Tree(Criteria("1"), {Tree(any()), Tree(any()), Tree(any())});
+  EXPECT_FALSE(isSubgraphMatch(n1, subtree, false));
+
+  reset();
+  subtree = Tree(
+      Criteria("1"),
+      {Tree(any()), Tree(any()), Tree(any(), {}, TestMatchNode::kStarCount)});
+  EXPECT_TRUE(isSubgraphMatch(n1, subtree, false));
+}
+
 TEST(SubgraphMatcher, DagMatching) {
   reset();
 
@@ -4,27 +4,42 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import caffe2.python._import_c_extension as C
-from caffe2.python import core
 from caffe2.proto import caffe2_pb2
 import os
 from subprocess import Popen, PIPE
-import errno
+
+try:
+    from google.protobuf.internal import api_implementation
+    if api_implementation.Type() == "cpp":
+        # The python-side parse in convertToCaffe2Proto otherwise refuses
+        # NetDefs above the default 64MB limit.
+        from google.protobuf.pyext import _message
+        _message.SetAllowOversizeProtos(True)
+except ImportError:
+    pass
 
 
 class NNModule(object):
     def __init__(self, net=None, device_map=None):
         if net is not None:
+            # core pulls in workspace and most of caffe2.python, so only
+            # import it when a net actually has to be converted.
+            from caffe2.python import core
+
             serialized_proto = None
             if isinstance(net, core.Net):
-                serialized_proto = net.Proto().SerializeToString()
+                # Read the NetDef directly: Net.Proto() hands out a mutable
+                # proto and so invalidates the net's lookup tables, forcing
+                # them to be rebuilt on the next mutation of the net.
+                serialized_proto = net._net.SerializeToString()
             elif isinstance(net, caffe2_pb2.NetDef):
                 serialized_proto = net.SerializeToString()
 
             # Distributed
             if device_map is not None:
-                serialized_device_map = {}
-                for k in device_map:
-                    serialized_device_map[k] = device_map[k].SerializeToString()
+                serialized_device_map = {
+                    k: v.SerializeToString() for k, v in device_map.items()
+                }
                 self._NNModule = C.NNModuleFromProtobufDistributed(serialized_proto,
                         serialized_device_map)
             # Default
@@ -41,40 +56,61 @@ class NNModule(object):
     def dataFlow(self):
         return self._NNModule.dataFlow()
 
-    def convertToCaffe2Proto(self, old_proto=None):
-        if not old_proto:
-            old_proto = caffe2_pb2.NetDef()
+    def convertToCaffe2Proto(self, old_proto=None, out=None):
+        # out, if given, is a NetDef that is cleared and filled with the
+        # result; it can be reused across calls to avoid building a new
+        # NetDef every time.
         output = self._NNModule.convertToCaffe2Proto(old_proto)
-        new_proto = caffe2_pb2.NetDef()
-        new_proto.ParseFromString(output)
-        return new_proto
-
-    def match(self, pattern):
-        for n in self.dataFlow.getMutableNodes():
-            m = C.matchSubgraph(n, pattern)
-            if m:
+        if out is None:
+            out = caffe2_pb2.NetDef()
+        else:
+            out.Clear()
+        out.MergeFromString(output)
+        return out
+
+    def match(self, pattern, parallel=False, num_threads=None):
+        # Matching runs in C++ without holding the GIL, so neither this graph
+        # nor pattern may be modified from another thread while a match is
+        # being looked for. Rewriting the graph from the loop body is fine.
+        # With parallel=True all matches are found up front by a pool of
+        # num_threads C++ threads (default: one per core). This is for
+        # read-only scans: deleting nodes while iterating would leave the
+        # remaining matches pointing at freed nodes.
+        if parallel:
+            for m in C.matchSubgraphParallel(
+                self.dataFlow, pattern, num_threads or 0
+            ):
                 yield m
+            return
+        for m in C.iterMatches(self.dataFlow, pattern.precompile()):
+            yield m
+
+
+# Path to the graph-easy executable, "" if it is not installed.
+# Looked up on the first call to render().
+_graph_easy_path = None
+
+
+def _find_graph_easy():
+    global _graph_easy_path
+    if _graph_easy_path is None:
+        _graph_easy_path = ""
+        for path in os.environ["PATH"].split(os.pathsep):
+            candidate = os.path.join(path, "graph-easy")
+            if os.access(candidate, os.X_OK):
+                _graph_easy_path = candidate
+                break
+    return _graph_easy_path
 
 
 def render(s):
     s = str(s)
-    cmd_exists = lambda x: any(
-        os.access(os.path.join(path, x), os.X_OK)
-        for path in os.environ["PATH"].split(os.pathsep)
-    )
-    if cmd_exists("graph-easy"):
-        p = Popen("graph-easy", stdin=PIPE)
-        try:
-            p.stdin.write(s.encode("utf-8"))
-        except IOError as e:
-            if e.errno == errno.EPIPE or e.errno == errno.EINVAL:
-                pass
-            else:
-                # Raise any other error.
-                raise
-
-        p.stdin.close()
-        p.wait()
+    graph_easy = _find_graph_easy()
+    if graph_easy:
+        p = Popen(graph_easy, stdin=PIPE)
+        # communicate() ignores EPIPE and EINVAL from a graph-easy that
+        # exits before reading all of its input, then closes stdin and waits.
+        p.communicate(s.encode("utf-8"))
     else:
         print(s)
 
@@ -85,5 +121,6 @@ NeuralNetData = C.NeuralNetData
 Data = C.NeuralNetData
 NNSubgraph = C.NNSubgraph
 NNMatchGraph = C.NNMatchGraph
+PrecompiledMatchGraph = C.PrecompiledMatchGraph
 Graph = C.Graph
 Annotation = C.Annotation
@@ -20,6 +20,16 @@ class TestBindings(test_util.TestCase):
         dfg.createNode(ng.NeuralNetOperator("FC"))
         assert len(nn.dataFlow.getMutableNodes()) == 2
 
+    def test_iter_nodes(self):
+        nn = ng.NNModule()
+        dfg = nn.dataFlow
+        x = dfg.createNode(ng.NeuralNetData("X"))
+        op = dfg.createNode(ng.NeuralNetOperator("FC"))
+        nodes = list(dfg.iterNodes())
+        assert len(nodes) == 2
+        assert x in nodes
+        assert op in nodes
+
     def test_core_net_simple(self):
         net = core.Net("name")
         net.FC(["X", "W"], ["Y"])
@@ -146,6 +156,72 @@ class TestBindings(test_util.TestCase):
             count += 1
         assert count == 1
 
+    def test_match_graph_precompiled(self):
+        mg = ng.NNMatchGraph()
+        test2m = mg.createNode(ng.NeuralNetOperator("test2"), strict=True)
+        xm = mg.createNode(ng.NeuralNetData("X"), strict=True)
+        testm = mg.createNode(ng.NeuralNetOperator("test"))
+        mg.createEdge(test2m, xm)
+        mg.createEdge(xm, testm)
+        precompiled = mg.precompile()
+
+        nn = ng.NNModule()
+        test2 = nn.dataFlow.createNode(ng.NeuralNetOperator("test2"))
+        x = nn.dataFlow.createNode(ng.NeuralNetData("X"))
+        test = nn.dataFlow.createNode(ng.NeuralNetOperator("test"))
+        nn.dataFlow.createEdge(test2, x)
+        nn.dataFlow.createEdge(x, test)
+
+        assert len(ng.C.matchSubgraph(test2, precompiled)) == 3
+        assert len(ng.C.matchSubgraph(test, precompiled)) == 0
+
+    def test_match_graph_parallel(self):
+        mg = ng.NNMatchGraph()
+        mg.createNode(ng.NeuralNetOperator("test"))
+        nn = ng.NNModule()
+        for _ in range(10):
+            test = nn.dataFlow.createNode(ng.NeuralNetOperator("test"))
+            x = nn.dataFlow.createNode(ng.NeuralNetData("X"))
+            nn.dataFlow.createEdge(x, test)
+
+        expected = len(list(nn.match(mg)))
+        assert expected == 10
+        for num_threads in [None, 1, 3, 32]:
+            count = 0
+            for match in nn.match(mg, parallel=True, num_threads=num_threads):
+                assert len(match) == 1
+                count += 1
+            assert count == expected
+
+    def test_match_graph_deleting(self):
+        mg = ng.NNMatchGraph()
+        testm = mg.createNode(ng.NeuralNetOperator("test"), strict=True)
+        xm = mg.createNode(ng.NeuralNetData("X"))
+        mg.createEdge(testm, xm)
+
+        # Both operators write X, so their matches overlap in X.
+        nn = ng.NNModule()
+        test1 = nn.dataFlow.createNode(ng.NeuralNetOperator("test"))
+        test2 = nn.dataFlow.createNode(ng.NeuralNetOperator("test"))
+        x = nn.dataFlow.createNode(ng.NeuralNetData("X"))
+        nn.dataFlow.createEdge(test1, x)
+        nn.dataFlow.createEdge(test2, x)
+
+        def delete_match(match):
+            assert len(match) == 2
+            for node in match.getNodes():
+                nn.dataFlow.deleteNode(node)
+
+        # Deleting the first match removes X, so the second operator no
+        # longer matches.
+        count = 0
+        for match in nn.match(mg):
+            delete_match(match)
+            count += 1
+        assert count == 1
+        assert not nn.dataFlow.hasNode(x)
+        assert nn.dataFlow.hasNode(test1) != nn.dataFlow.hasNode(test2)
+
     def test_genericGraph(self):
         g = ng.Graph()
         n1 = g.createNode("hello1")
@@ -176,6 +252,18 @@ class TestBindings(test_util.TestCase):
         for a, b in zip(new_netdef.external_output, net.Proto().external_output):
             assert a == b
 
+    def test_convertToProto_out(self):
+        net = core.Net("name")
+        net.FC(["X", "W"], ["Y"])
+        nn = ng.NNModule(net)
+        out = caffe2_pb2.NetDef()
+        out.name = "stale"
+        for _ in range(2):
+            new_netdef = nn.convertToCaffe2Proto(out=out)
+            assert new_netdef is out
+            assert new_netdef.name != "stale"
+            assert len(new_netdef.op) == len(net.Proto().op)
+
     def test_node_interactions(self):
         nn = ng.NNModule()
         dfg = nn.dataFlow
@@ -11,9 +11,16 @@
 #include "nomnigraph/Graph/Algorithms.h"
 #include "nomnigraph/Representations/NeuralNet.h"
 
+#include <google/protobuf/io/coded_stream.h>
+#include <google/protobuf/io/zero_copy_stream_impl_lite.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include <algorithm>
+#include <exception>
+#include <thread>
+#include <unordered_map>
+
 using ListCasterBase = pybind11::detail::list_caster<
     std::vector<nom::repr::NNGraph::NodeRef>,
     nom::repr::NNGraph::NodeRef>;
@@ -67,6 +74,106 @@ std::map<std::string, std::string> GraphPrinter(typename Graph::NodeRef node) {
   return labelMap;
 };
 
+// Iterates over a snapshot of the nodes of a graph, handing them to Python
+// one at a time. Nodes deleted from the graph after the snapshot was taken
+// are skipped, so the graph can be mutated while iterating.
+struct NNNodeIterator {
+  explicit NNNodeIterator(NNGraph* g)
+      : graph(g), nodes(g->getNodesSnapshot()) {}
+
+  NNGraph::NodeRef next() {
+    if (auto node = nextOrNull()) {
+      return node;
+    }
+    throw py::stop_iteration();
+  }
+
+  NNGraph::NodeRef nextOrNull() {
+    while (index < nodes->size()) {
+      auto node = (*nodes)[index++];
+      if (graph->hasNode(node)) {
+        return node;
+      }
+    }
+    return nullptr;
+  }
+
+  NNGraph* graph;
+  std::shared_ptr<const std::vector<NNGraph::NodeRef>> nodes;
+  size_t index = 0;
+};
+
+// Get root node or node in root cycle
+nn::NNMatchGraph::NodeRef getMatchGraphRoot(nn::NNMatchGraph* mg) {
+  return *nom::algorithm::tarjans(mg).back().getNodes().begin();
+}
+
+NNSubgraph matchSubgraphAt(
+    NNGraph::NodeRef node,
+    nn::NNMatchGraph::NodeRef match_node) {
+  auto result =
+      nn::NNSubgraphMatcher::isSubgraphMatch(node, match_node, false);
+  if (result.isMatch()) {
+    return *result.getMatchedSubgraph();
+  }
+  return NNSubgraph();
+}
+
+// A match graph with its root resolved ahead of time, so that matching it
+// at every node of a graph runs Tarjan's algorithm on the pattern once
+// instead of once per node. It has to be recreated if the match graph
+// changes.
+struct PrecompiledMatchGraph {
+  explicit PrecompiledMatchGraph(nn::NNMatchGraph* mg)
+      : root(getMatchGraphRoot(mg)) {}
+
+  nn::NNMatchGraph::NodeRef root;
+};
+
+// Scans a graph for matches of a pattern one node at a time, but only
+// hands the matches to Python: nodes that don't match never get a Python
+// wrapper. Nodes are visited as in NNNodeIterator, so the graph can be
+// rewritten between matches. The GIL is released while looking for the next
+// match, so, as for matchSubgraph, the graph and the pattern must not be
+// mutated from another thread during that step.
+struct NNMatchIterator {
+  NNMatchIterator(NNGraph* g, const PrecompiledMatchGraph& pattern)
+      : nodes(g), pattern(pattern) {}
+
+  NNSubgraph next() {
+    {
+      py::gil_scoped_release g;
+      while (auto node = nodes.nextOrNull()) {
+        auto match = matchSubgraphAt(node, pattern.root);
+        if (match.getNodes().size()) {
+          return match;
+        }
+      }
+    }
+    throw py::stop_iteration();
+  }
+
+  NNNodeIterator nodes;
+  PrecompiledMatchGraph pattern;
+};
+
+// Parses a serialized proto straight out of the buffer of a Python bytes
+// object, rather than copying it into a std::string first.
+bool ParseProtoFromPyBytes(
+    const py::bytes& bytes,
+    ::google::protobuf::MessageLite* proto) {
+  char* buffer = nullptr;
+  Py_ssize_t length = 0;
+  if (PYBIND11_BYTES_AS_STRING_AND_SIZE(bytes.ptr(), &buffer, &length)) {
+    throw py::error_already_set();
+  }
+  ::google::protobuf::io::ArrayInputStream input_stream(buffer, length);
+  ::google::protobuf::io::CodedInputStream coded_stream(&input_stream);
+  // Same 2G limit as ParseProtoFromLargeString.
+  coded_stream.SetTotalBytesLimit(2147483647, 512LL << 20);
+  return proto->ParseFromCodedStream(&coded_stream);
+}
+
 } // namespace
 
 void addNomnigraphMethods(pybind11::module& m) {
@@ -96,24 +203,31 @@ void addNomnigraphMethods(pybind11::module& m) {
   // NNModule methods
   m.def("NNModuleFromProtobuf", [](py::bytes def) {
     caffe2::NetDef proto;
-    CAFFE_ENFORCE(ParseProtoFromLargeString(def.cast<std::string>(), &proto));
+    CAFFE_ENFORCE(ParseProtoFromPyBytes(def, &proto));
     return caffe2::convertToNNModule(proto);
   });
 
   m.def(
       "NNModuleFromProtobufDistributed",
-      [](py::bytes def, std::map<std::string, py::bytes> blobToDeviceMap) {
+      [](py::bytes def,
+         const std::map<std::string, py::bytes>& blobToDeviceMap) {
         std::map<std::string, caffe2::DeviceOption> m;
+        // Device maps typically assign the same DeviceOption to many blobs,
+        // so parse each distinct serialized DeviceOption only once.
+        std::unordered_map<std::string, caffe2::DeviceOption> parsed;
         for (const auto& el : blobToDeviceMap) {
-          caffe2::DeviceOption d;
-          CAFFE_ENFORCE(
-              ParseProtoFromLargeString(el.second.cast<std::string>(), &d));
-          m[el.first] = d;
+          auto serialized = el.second.cast<std::string>();
+          auto it = parsed.find(serialized);
+          if (it == parsed.end()) {
+            caffe2::DeviceOption d;
+            CAFFE_ENFORCE(ParseProtoFromPyBytes(el.second, &d));
+            it = parsed.emplace(std::move(serialized), std::move(d)).first;
+          }
+          m[el.first] = it->second;
         }
 
         caffe2::NetDef proto;
-        CAFFE_ENFORCE(
-            ParseProtoFromLargeString(def.cast<std::string>(), &proto));
+        CAFFE_ENFORCE(ParseProtoFromPyBytes(def, &proto));
 
         return caffe2::convertToNNModule(proto, m);
       });
@@ -125,12 +239,16 @@ void addNomnigraphMethods(pybind11::module& m) {
           [](NNModule* nn) -> NNGraph* { return &nn->dataFlow; },
           py::return_value_policy::reference_internal)
       .def("convertToCaffe2Proto", [](NNModule& nn, py::object def) {
-        CAFFE_ENFORCE(
-            pybind11::hasattr(def, "SerializeToString"),
-            "convertToCaffe2Proto takes either no args", "a NetDef");
-        auto str = def.attr("SerializeToString")();
         caffe2::NetDef proto;
-        proto.ParseFromString(py::bytes(str));
+        // None stands for an empty NetDef and skips the serialize/parse
+        // round trip of the old proto.
+        if (!def.is_none()) {
+          CAFFE_ENFORCE(
+              pybind11::hasattr(def, "SerializeToString"),
+              "convertToCaffe2Proto takes either no args", "a NetDef");
+          py::bytes str = def.attr("SerializeToString")();
+          CAFFE_ENFORCE(ParseProtoFromPyBytes(str, &proto));
+        }
         auto new_proto = caffe2::convertToCaffe2Proto(nn, proto);
         std::string out;
         new_proto.SerializeToString(&out);
@@ -191,6 +309,31 @@ void addNomnigraphMethods(pybind11::module& m) {
       .def(
           "getMutableNodes",
           [](NNGraph* g) { return g->getMutableNodes(); },
+          py::return_value_policy::reference_internal)
+      .def(
+          "hasNode",
+          [](NNGraph* g, NNGraph::NodeRef n) { return g->hasNode(n); })
+      .def(
+          "deleteNode",
+          [](NNGraph* g, NNGraph::NodeRef n) { g->deleteNode(n); })
+      .def(
+          "iterNodes",
+          [](NNGraph* g) { return NNNodeIterator(g); },
+          py::keep_alive<0, 1>());
+
+  py::class_<NNNodeIterator> nodeIterator(m, "NNNodeIterator");
+  nodeIterator
+      .def(
+          "__iter__",
+          [](NNNodeIterator& it) -> NNNodeIterator& { return it; },
+          py::return_value_policy::reference_internal)
+      .def(
+          "__next__",
+          &NNNodeIterator::next,
+          py::return_value_policy::reference_internal)
+      .def(
+          "next",
+          &NNNodeIterator::next,
           py::return_value_policy::reference_internal);
 
   // Node level methods
@@ -275,7 +418,15 @@ void addNomnigraphMethods(pybind11::module& m) {
 
   // Subgraph matching API
   py::class_<NNSubgraph> nnsubgraph(m, "NNSubgraph");
-  nnsubgraph.def("__len__", [](NNSubgraph& s) { return s.getNodes().size(); });
+  nnsubgraph
+      .def("__len__", [](NNSubgraph& s) { return s.getNodes().size(); })
+      .def(
+          "getNodes",
+          [](NNSubgraph& s) {
+            return std::vector<NNGraph::NodeRef>(
+                s.getNodes().begin(), s.getNodes().end());
+          },
+          py::return_value_policy::reference);
 
   py::class_<nn::NNMatchGraph> nnMatchGraph(m, "NNMatchGraph");
   nnMatchGraph.def(py::init<>());
@@ -339,16 +490,109 @@ void addNomnigraphMethods(pybind11::module& m) {
           [](nn::NNMatchGraph* g) { return g->getMutableNodes(); },
           py::return_value_policy::reference_internal);
 
+  py::class_<PrecompiledMatchGraph> precompiledMatchGraph(
+      m, "PrecompiledMatchGraph");
+  nnMatchGraph.def(
+      "precompile",
+      [](nn::NNMatchGraph* g) { return PrecompiledMatchGraph(g); },
+      py::keep_alive<0, 1>());
+
+  // Matching never calls back into Python, so other Python threads can run
+  // while it is in progress. The GIL is what used to keep them from
+  // touching the graph meanwhile: callers must ensure that neither the graph
+  // nor the pattern is mutated from another thread during a match.
   m.def("matchSubgraph", [](NNGraph::NodeRef node, nn::NNMatchGraph* mg) {
-    // Get root node or node in root cycle
-    auto match_node = *nom::algorithm::tarjans(mg).back().getNodes().begin();
-    auto result =
-        nn::NNSubgraphMatcher::isSubgraphMatch(node, match_node, false);
-    if (result.isMatch()) {
-      return *result.getMatchedSubgraph();
-    }
-    return NNSubgraph();
+    py::gil_scoped_release g;
+    return matchSubgraphAt(node, getMatchGraphRoot(mg));
   });
+  m.def(
+      "matchSubgraph",
+      [](NNGraph::NodeRef node, PrecompiledMatchGraph* pc) {
+        py::gil_scoped_release g;
+        return matchSubgraphAt(node, pc->root);
+      });
+
+  m.def(
+      "iterMatches",
+      [](NNGraph* g, PrecompiledMatchGraph* pc) {
+        return NNMatchIterator(g, *pc);
+      },
+      py::keep_alive<0, 1>(),
+      py::keep_alive<0, 2>());
+
+  py::class_<NNMatchIterator> matchIterator(m, "NNMatchIterator");
+  matchIterator
+      .def(
+          "__iter__",
+          [](NNMatchIterator& it) -> NNMatchIterator& { return it; },
+          py::return_value_policy::reference_internal)
+      .def("__next__", &NNMatchIterator::next)
+      .def("next", &NNMatchIterator::next);
+
+  m.def(
+      "matchSubgraphParallel",
+      [](NNGraph* g, nn::NNMatchGraph* mg, int numThreads) {
+        auto match_node = getMatchGraphRoot(mg);
+        auto nodes = g->getMutableNodes();
+        if (numThreads <= 0) {
+          numThreads = std::max(1u, std::thread::hardware_concurrency());
+        }
+        // Don't start threads that would get no nodes to match.
+        numThreads = static_cast<int>(std::min<size_t>(
+            numThreads, std::max<size_t>(1, nodes.size())));
+        py::gil_scoped_release release;
+        // Each thread matches a contiguous slice of the nodes so that the
+        // concatenated results keep the order of a sequential scan.
+        std::vector<std::vector<NNSubgraph>> partial(numThreads);
+        // An exception escaping a thread would terminate the process, so
+        // each thread stores it to be rethrown once all threads are joined.
+        std::vector<std::exception_ptr> errors(numThreads);
+        std::vector<std::thread> threads;
+        threads.reserve(numThreads);
+        size_t chunk = (nodes.size() + numThreads - 1) / numThreads;
+        try {
+          for (int t = 0; t < numThreads; ++t) {
+            threads.emplace_back([&, t]() {
+              try {
+                size_t begin = std::min(nodes.size(), t * chunk);
+                size_t end = std::min(nodes.size(), begin + chunk);
+                for (size_t i = begin; i < end; ++i) {
+                  auto result = nn::NNSubgraphMatcher::isSubgraphMatch(
+                      nodes[i], match_node, false);
+                  if (result.isMatch()) {
+                    partial[t].emplace_back(*result.getMatchedSubgraph());
+                  }
+                }
+              } catch (...) {
+                errors[t] = std::current_exception();
+              }
+            });
+          }
+        } catch (...) {
+          // Creating a thread can fail; the threads already running still
+          // have to be joined before the vector holding them is destroyed.
+          for (auto& thread : threads) {
+            thread.join();
+          }
+          throw;
+        }
+        for (auto& thread : threads) {
+          thread.join();
+        }
+        for (auto& error : errors) {
+          if (error) {
+            std::rethrow_exception(error);
+          }
+        }
+        std::vector<NNSubgraph> matches;
+        for (auto& p : partial) {
+          matches.insert(matches.end(), p.begin(), p.end());
+        }
+        return matches;
+      },
+      py::arg("graph"),
+      py::arg("pattern"),
+      py::arg("num_threads") = 0);
 
   // Annotation API
   py::class_<Caffe2Annotation> annotation(m, "Annotation");
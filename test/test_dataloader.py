@@ -5,17 +5,22 @@ import os
 import ctypes
 import signal
 import torch
-import gc
 import time
 import traceback
 import unittest
-import subprocess
 import itertools
 from torch import multiprocessing as mp
 from torch.utils.data import Dataset, TensorDataset, DataLoader, ConcatDataset
 from torch.utils.data.dataset import random_split
 from torch.utils.data.dataloader import default_collate, ExceptionWrapper, MP_STATUS_CHECK_INTERVAL
-from common import TestCase, run_tests, TEST_NUMPY, IS_WINDOWS, NO_MULTIPROCESSING_SPAWN, skipIfRocm
+from common import TestCase, run_tests, TEST_NUMPY, IS_WINDOWS, NO_MULTIPROCESSING_SPAWN, skipIfRocm, \
+    set_rng_seed, SEED
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
 
 # We cannot import TEST_CUDA from common_cuda here, because if we do that,
 # the TEST_CUDNN line from common_cuda will be executed multiple times
@@ -26,11 +31,31 @@ TEST_CUDA = torch.cuda.is_available()
 if not NO_MULTIPROCESSING_SPAWN:
     # Get a multiprocessing context because some test / third party library will
     # set start_method when imported, and setting again triggers RuntimeError.
-    mp = mp.get_context(method='spawn')
+    if IS_WINDOWS:
+        mp = mp.get_context(method='spawn')
+    else:
+        # Like spawn, forkserver starts children from a fresh interpreter that
+        # has not initialized CUDA, but torch is only imported once, by the
+        # server, instead of in every test process.
+        mp = mp.get_context(method='forkserver')
+        mp.set_forkserver_preload(['torch'])
 
 
 JOIN_TIMEOUT = 17.0 if IS_WINDOWS else 8.5
 
+if IS_WINDOWS:
+    from ctypes.wintypes import DWORD, BOOL, HANDLE
+
+    # Used by TestDataLoader._is_process_alive. Declaring the signatures keeps
+    # ctypes from truncating HANDLEs to a C int on 64-bit Windows.
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.OpenProcess.argtypes = (DWORD, BOOL, DWORD)
+    _kernel32.OpenProcess.restype = HANDLE
+    _kernel32.WaitForSingleObject.argtypes = (HANDLE, DWORD)
+    _kernel32.WaitForSingleObject.restype = DWORD
+    _kernel32.CloseHandle.argtypes = (HANDLE,)
+    _kernel32.CloseHandle.restype = BOOL
+
 
 class TestDatasetRandomSplit(TestCase):
     def test_lengths_must_equal_datset_size(self):
@@ -64,24 +89,21 @@ class TestTensorDataset(TestCase):
         t = torch.randn(15, 10, 2, 3, 4, 5)
         l = torch.randn(15, 10)
         source = TensorDataset(t, l)
-        for i in range(15):
-            self.assertEqual(t[i], source[i][0])
-            self.assertEqual(l[i], source[i][1])
+        self.assertEqual(t, torch.stack([source[i][0] for i in range(15)]))
+        self.assertEqual(l, torch.stack([source[i][1] for i in range(15)]))
 
     def test_getitem_1d(self):
         t = torch.randn(15)
         l = torch.randn(15)
         source = TensorDataset(t, l)
-        for i in range(15):
-            self.assertEqual(t[i], source[i][0])
-            self.assertEqual(l[i], source[i][1])
+        self.assertEqual(t, torch.stack([source[i][0] for i in range(15)]))
+        self.assertEqual(l, torch.stack([source[i][1] for i in range(15)]))
 
     def test_single_tensor(self):
         t = torch.randn(5, 10)
         source = TensorDataset(t)
         self.assertEqual(len(source), 5)
-        for i in range(5):
-            self.assertEqual(t[i], source[i][0])
+        self.assertEqual(t, torch.stack([source[i][0] for i in range(5)]))
 
     def test_many_tensors(self):
         t0 = torch.randn(5, 10, 2, 3, 4, 5)
@@ -90,11 +112,8 @@ class TestTensorDataset(TestCase):
         t3 = torch.randn(5, 10, 3, 7)
         source = TensorDataset(t0, t1, t2, t3)
         self.assertEqual(len(source), 5)
-        for i in range(5):
-            self.assertEqual(t0[i], source[i][0])
-            self.assertEqual(t1[i], source[i][1])
-            self.assertEqual(t2[i], source[i][2])
-            self.assertEqual(t3[i], source[i][3])
+        for j, t in enumerate((t0, t1, t2, t3)):
+            self.assertEqual(t, torch.stack([source[i][j] for i in range(5)]))
 
 
 class TestConcatDataset(TestCase):
@@ -134,9 +153,9 @@ class TestConcatDataset(TestCase):
         d3 = TensorDataset(torch.rand(7, 3, 28, 28), torch.rand(7))
         result = d1 + d2 + d3
         self.assertEqual(21, len(result))
-        self.assertEqual(0, (d1[0][0] - result[0][0]).abs().sum())
-        self.assertEqual(0, (d2[0][0] - result[7][0]).abs().sum())
-        self.assertEqual(0, (d3[0][0] - result[14][0]).abs().sum())
+        self.assertEqual(d1[0][0], result[0][0])
+        self.assertEqual(d2[0][0], result[7][0])
+        self.assertEqual(d3[0][0], result[14][0])
 
 
 # Stores the first encountered exception in .exception.
@@ -271,10 +290,10 @@ def disable_stderr(worker_id):
     This is used as worker_init_fn for test_segfault.
     """
     sys.stderr.flush()  # flush library buffers that dup2 knows nothing about
-    # Can't use a with-block because otherwise the fd will be closed when this
-    # function ends.
-    devnull = open(os.devnull, 'w')
-    os.dup2(devnull.fileno(), sys.stderr.fileno())
+    # The raw fd can be closed right away, as stderr now refers to the file.
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stderr.fileno())
+    os.close(devnull)
 
 
 def _test_segfault():
@@ -336,12 +355,10 @@ def _test_proper_exit(use_workers, pin_memory, exit_method, hold_iter_reference,
             elif exit_method == 'worker_kill':
                 kill_pid(worker_pids[0])
 
-    if not hold_iter_reference:
-        # Tries to trigger the __del__ clean-up rather than the automatic
-        # exiting of daemonic children. Technically it should be automatically
-        # triggered, but I don't want to rely on the implementation detail of
-        # Python gc.
-        gc.collect()
+    # If not hold_iter_reference, the loop held the last reference to the
+    # iterator, so its __del__ clean-up has run by now rather than the
+    # automatic exiting of daemonic children. The iterator is not part of a
+    # reference cycle, so this does not need a gc.collect().
 
 
 # test custom init function
@@ -351,10 +368,20 @@ def init_fn(worker_id):
 
 class TestDataLoader(TestCase):
 
-    def setUp(self):
-        self.data = torch.randn(100, 2, 3, 5)
-        self.labels = torch.randperm(50).repeat(2)
-        self.dataset = TensorDataset(self.data, self.labels)
+    @classmethod
+    def setUpClass(cls):
+        super(TestDataLoader, cls).setUpClass()
+        # None of the tests modify these, so they are built once for the class.
+        # Seed first, as TestCase.setUp would, so that the data does not depend
+        # on which tests ran before this class.
+        set_rng_seed(SEED)
+        cls.data = torch.randn(100, 2, 3, 5)
+        cls.labels = torch.arange(100) % 50
+        cls.dataset = TensorDataset(cls.data, cls.labels)
+        # Maps the values of each data point to its index, so that
+        # _test_shuffle can find a sample without scanning all of self.data.
+        cls.data_index = {tuple(data_point.view(-1).tolist()): idx
+                          for idx, data_point in enumerate(cls.data)}
 
     def _test_sequential(self, loader):
         batch_size = loader.batch_size
@@ -366,19 +393,16 @@ class TestDataLoader(TestCase):
 
     def _test_shuffle(self, loader):
         found_data = {i: 0 for i in range(self.data.size(0))}
-        found_labels = {i: 0 for i in range(self.labels.size(0))}
+        num_found_data = 0
         batch_size = loader.batch_size
         for i, (batch_samples, batch_targets) in enumerate(loader):
             for sample, target in zip(batch_samples, batch_targets):
-                for data_point_idx, data_point in enumerate(self.data):
-                    if data_point.eq(sample).all():
-                        self.assertFalse(found_data[data_point_idx])
-                        found_data[data_point_idx] += 1
-                        break
+                data_point_idx = self.data_index[tuple(sample.view(-1).tolist())]
+                self.assertFalse(found_data[data_point_idx])
+                found_data[data_point_idx] += 1
+                num_found_data += 1
                 self.assertEqual(target, self.labels[data_point_idx])
-                found_labels[data_point_idx] += 1
-            self.assertEqual(sum(found_data.values()), (i + 1) * batch_size)
-            self.assertEqual(sum(found_labels.values()), (i + 1) * batch_size)
+            self.assertEqual(num_found_data, (i + 1) * batch_size)
         self.assertEqual(i, math.floor((len(self.dataset) - 1) / batch_size))
 
     def _test_error(self, loader):
@@ -423,6 +447,10 @@ class TestDataLoader(TestCase):
         for input, target in loader:
             self.assertTrue(input.is_pinned())
             self.assertTrue(target.is_pinned())
+            # Pinned batches can be copied to the GPU asynchronously.
+            input_cuda = input.cuda(non_blocking=True)
+            torch.cuda.synchronize()
+            self.assertEqual(input_cuda.cpu(), input)
 
     def test_multiple_dataloaders(self):
         loader1_it = iter(DataLoader(self.dataset, num_workers=1))
@@ -457,16 +485,20 @@ class TestDataLoader(TestCase):
             targets = (_test_timeout, _test_timeout_pin_memory)
         else:
             targets = (_test_timeout,)
-        for target in targets:
-            p = ErrorTrackingProcess(target=target)
+        # Start all processes before joining any, so that their startup and
+        # timeouts overlap instead of adding up.
+        processes = [ErrorTrackingProcess(target=target) for target in targets]
+        for p in processes:
             p.start()
-            p.join(JOIN_TIMEOUT)
-            try:
+        try:
+            for p in processes:
+                p.join(JOIN_TIMEOUT)
                 self.assertFalse(p.is_alive())
                 self.assertNotEqual(p.exitcode, 0)
                 self.assertIsInstance(p.exception, RuntimeError)
                 self.assertRegex(str(p.exception), r'DataLoader timed out after \d+ seconds')
-            finally:
+        finally:
+            for p in processes:
                 p.terminate()
 
     def test_worker_seed(self):
@@ -560,12 +592,13 @@ class TestDataLoader(TestCase):
         num_processes = 4
         num_batches = 9
         data_set = torch.IntTensor(range(num_batches))
-        scanned_data = torch.IntTensor([])
+        scanned_batches = []
         for i in range(num_processes):
             s = DistributedSampler(data_set, num_processes, i)
             d_loader = DataLoader(data_set, batch_size=int(num_batches / num_processes), drop_last=True, sampler=s)
-            for k, data in enumerate(d_loader):
-                scanned_data = torch.cat((scanned_data, data), 0)
+            for data in d_loader:
+                scanned_batches.append(data)
+        scanned_data = torch.cat(scanned_batches, 0)
 
         self.assertEqual(scanned_data.size(), scanned_data.unique().size())
 
@@ -589,7 +622,7 @@ class TestDataLoader(TestCase):
 
         class TestDataset(torch.utils.data.Dataset):
             def __getitem__(self, i):
-                return np.ones((2, 3, 4)) * i
+                return np.full((2, 3, 4), i, dtype=np.float64)
 
             def __len__(self):
                 return 1000
@@ -633,19 +666,46 @@ class TestDataLoader(TestCase):
                 self.assertFalse(pin_memory_thread.is_alive())
 
     @staticmethod
-    def _is_process_alive(pid, pname):
+    def _is_process_alive(pid):
         # There is a chance of a terminated child process's pid being reused by a new unrelated process,
         # but since we are looping this check very frequently, we will know that the child process dies
         # before the new unrelated process starts.
+        if HAS_PSUTIL:
+            try:
+                # An exited worker stays a zombie until the loader process reaps it.
+                return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+            except psutil.NoSuchProcess:
+                return False
         if IS_WINDOWS:
-            command = 'tasklist | find "{}" /i'.format(pid)
-        else:
-            command = 'ps -p {} -o comm='.format(pid)
-        p = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
-        (output, err) = p.communicate()
-        p_status = p.wait()
-        output = output.decode('utf-8')
-        return pname in output
+            # Values obtained from https://msdn.microsoft.com/en-us/library/ms684880.aspx,
+            # https://msdn.microsoft.com/en-us/library/windows/desktop/ms687032.aspx and
+            # https://msdn.microsoft.com/en-us/library/windows/desktop/ms681382.aspx
+            SYNCHRONIZE = 0x00100000
+            WAIT_OBJECT_0 = 0x00000000
+            WAIT_TIMEOUT = 0x00000102
+            ERROR_INVALID_PARAMETER = 87
+            handle = _kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+            if not handle:
+                error = ctypes.get_last_error()
+                if error == ERROR_INVALID_PARAMETER:
+                    # There is no process with this pid anymore.
+                    return False
+                raise ctypes.WinError(error)
+            try:
+                result = _kernel32.WaitForSingleObject(handle, 0)
+                if result == WAIT_OBJECT_0:
+                    return False
+                if result == WAIT_TIMEOUT:
+                    return True
+                raise ctypes.WinError(ctypes.get_last_error())
+            finally:
+                _kernel32.CloseHandle(handle)
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            # EPERM means that the process exists but belongs to someone else.
+            return e.errno != errno.ESRCH
+        return True
 
     @skipIfRocm
     def test_proper_exit(self):
@@ -662,19 +722,18 @@ class TestDataLoader(TestCase):
             r"""Wait for all process specified in pids to exit in given timeout."""
             exit_status = [False for _ in pids]
             start_time = time.time()
-            pname = 'python'
             while True:
                 for i in range(len(pids)):
                     pid = pids[i]
                     if not exit_status[i]:
-                        if not TestDataLoader._is_process_alive(pid, pname):
+                        if not TestDataLoader._is_process_alive(pid):
                             exit_status[i] = True
                 if all(exit_status):
                     break
                 else:
                     if time.time() - start_time > timeout:
                         break
-                    time.sleep(0.5)
+                    time.sleep(0.05)
             return exit_status
 
         for use_workers, pin_memory, hold_iter_reference in itertools.product([True, False], repeat=3):
@@ -686,7 +745,7 @@ class TestDataLoader(TestCase):
             # processes still exit in both cases.
 
             if pin_memory and (not TEST_CUDA or NO_MULTIPROCESSING_SPAWN):
-                # Can't use CUDA without spawn
+                # Can't use CUDA without spawn or forkserver
                 continue
 
             # `exit_method` controls the way the loader process ends.
@@ -820,14 +879,19 @@ class TestStringDataLoader(TestCase):
 
 
 class DictDataset(Dataset):
+    def __init__(self):
+        # Sample ndx is filled with ndx; the samples are views into one tensor.
+        self.tensors = torch.arange(4, dtype=torch.float).view(4, 1, 1).expand(4, 4, 2).contiguous()
+        self.numbers = torch.arange(4)
+
     def __len__(self):
         return 4
 
     def __getitem__(self, ndx):
         return {
-            'a_tensor': torch.Tensor(4, 2).fill_(ndx),
+            'a_tensor': self.tensors[ndx],
             'another_dict': {
-                'a_number': ndx,
+                'a_number': self.numbers[ndx],
             },
         }
 
@@ -839,20 +903,25 @@ class TestDictDataLoader(TestCase):
     def test_sequential_batch(self):
         loader = DataLoader(self.dataset, batch_size=2, shuffle=False)
         batch_size = loader.batch_size
+        t_size = torch.Size([batch_size, 4, 2])
+        n_size = torch.Size([batch_size])
         for i, sample in enumerate(loader):
             idx = i * batch_size
-            self.assertEqual(set(sample.keys()), {'a_tensor', 'another_dict'})
-            self.assertEqual(set(sample['another_dict'].keys()), {'a_number'})
+            self.assertEqual(len(sample), 2)
+            self.assertIn('a_tensor', sample)
+            self.assertIn('another_dict', sample)
+            self.assertEqual(len(sample['another_dict']), 1)
+            self.assertIn('a_number', sample['another_dict'])
 
             t = sample['a_tensor']
-            self.assertEqual(t.size(), torch.Size([batch_size, 4, 2]))
-            self.assertTrue((t[0] == idx).all())
-            self.assertTrue((t[1] == idx + 1).all())
+            self.assertEqual(t.size(), t_size)
+            # Sample ndx is filled with the value ndx.
+            expected = torch.arange(idx, idx + batch_size)
+            self.assertEqual(t, expected.float().view(-1, 1, 1).expand(t_size))
 
             n = sample['another_dict']['a_number']
-            self.assertEqual(n.size(), torch.Size([batch_size]))
-            self.assertEqual(n[0], idx)
-            self.assertEqual(n[1], idx + 1)
+            self.assertEqual(n.size(), n_size)
+            self.assertEqual(n, expected)
 
     @unittest.skipIf(not TEST_CUDA, "CUDA unavailable")
     @skipIfRocm
@@ -861,6 +930,68 @@ class TestDictDataLoader(TestCase):
         for batch_ndx, sample in enumerate(loader):
             self.assertTrue(sample['a_tensor'].is_pinned())
             self.assertTrue(sample['another_dict']['a_number'].is_pinned())
+            a_tensor_cuda = sample['a_tensor'].cuda(non_blocking=True)
+            torch.cuda.synchronize()
+            self.assertEqual(a_tensor_cuda.cpu(), sample['a_tensor'])
+
+    @unittest.skipIf(not TEST_CUDA, "CUDA unavailable")
+    @skipIfRocm
+    def test_pin_memory_stream(self):
+        # Copies every batch to the GPU on a side stream while the pin memory
+        # thread keeps producing batches, and only waits for the copies at the
+        # end. The CPU batches are kept alive until the copies are done.
+        loader = DataLoader(self.dataset, batch_size=2, pin_memory=True, num_workers=2)
+        stream = torch.cuda.Stream()
+        copies = []
+        for sample in loader:
+            self.assertTrue(sample['a_tensor'].is_pinned())
+            with torch.cuda.stream(stream):
+                copies.append((sample['a_tensor'], sample['a_tensor'].cuda(non_blocking=True)))
+        stream.synchronize()
+        self.assertEqual(len(copies), 2)
+        for a_tensor, a_tensor_cuda in copies:
+            self.assertEqual(a_tensor_cuda.cpu(), a_tensor)
+
+
+class SimpleCustomBatch(object):
+    def __init__(self, data):
+        transposed_data = list(zip(*data))
+        self.inp = torch.stack(transposed_data[0], 0)
+        self.tgt = torch.stack(transposed_data[1], 0)
+
+    def pin_memory(self):
+        self.inp = self.inp.pin_memory()
+        self.tgt = self.tgt.pin_memory()
+        return self
+
+
+def collate_wrapper(batch):
+    return SimpleCustomBatch(batch)
+
+
+class TestCustomPinFn(TestCase):
+    def setUp(self):
+        inps = torch.arange(10 * 5, dtype=torch.float32).view(10, 5)
+        tgts = torch.arange(10, dtype=torch.float32).view(10, 1)
+        self.dataset = TensorDataset(inps, tgts)
+
+    @unittest.skipIf(not TEST_CUDA, "CUDA unavailable")
+    @skipIfRocm
+    def test_custom_batch_pin(self):
+        loader = DataLoader(self.dataset, batch_size=2, collate_fn=collate_wrapper,
+                            pin_memory=True)
+        for sample in loader:
+            self.assertTrue(sample.inp.is_pinned())
+            self.assertTrue(sample.tgt.is_pinned())
+
+    @unittest.skipIf(not TEST_CUDA, "CUDA unavailable")
+    @skipIfRocm
+    def test_custom_batch_pin_worker(self):
+        loader = DataLoader(self.dataset, batch_size=2, collate_fn=collate_wrapper,
+                            pin_memory=True, num_workers=1)
+        for sample in loader:
+            self.assertTrue(sample.inp.is_pinned())
+            self.assertTrue(sample.tgt.is_pinned())
 
 
 class TestWorkerQueueDataset(Dataset):
@@ -871,6 +1002,11 @@ class TestWorkerQueueDataset(Dataset):
     def worker_init_fn(self, worker_id):
         self.worker_id = worker_id
 
+    def __reduce__(self):
+        # worker_id is set by worker_init_fn in each worker, so only the data
+        # needs to be sent to workers that receive a pickled copy.
+        return type(self), (self.data,)
+
     def __getitem__(self, item):
         return self.worker_id, self.data[item]
 
@@ -878,28 +1014,90 @@ class TestWorkerQueueDataset(Dataset):
         return len(self.data)
 
 
+class BatchedWorkerQueueDataset(TestWorkerQueueDataset):
+    def __getitems__(self, indices):
+        # Returns the whole batch at once, already in its collated form.
+        indices = torch.tensor(indices)
+        return torch.full_like(indices, self.worker_id), self.data[indices]
+
+
+class CountingGetItemsDataset(Dataset):
+    def __init__(self, size):
+        self.size = size
+        self.getitem_calls = 0
+        self.getitems_calls = []
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        self.getitem_calls += 1
+        return torch.tensor([idx])
+
+    def __getitems__(self, indices):
+        self.getitems_calls.append(list(indices))
+        return [torch.tensor([idx]) for idx in indices]
+
+
+class TestGetItemsDataLoader(TestCase):
+    def test_getitems_same_process(self):
+        dataset = CountingGetItemsDataset(10)
+        loader = DataLoader(dataset, batch_size=4)
+        batches = list(loader)
+        self.assertEqual(dataset.getitem_calls, 0)
+        self.assertEqual(dataset.getitems_calls, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+        self.assertEqual(len(batches), 3)
+        for i, batch in enumerate(batches):
+            # The samples returned by __getitems__ go through default_collate.
+            self.assertEqual(batch, torch.arange(i * 4, min(i * 4 + 4, 10)).view(-1, 1))
+
+
+def collate_identity(batch):
+    return batch
+
+
+def collate_worker_queue_batch(batch):
+    # Items are (int, 0-dim tensor) pairs, so the batch can be built with one
+    # call per field instead of through default_collate's type dispatch.
+    worker_ids, samples = zip(*batch)
+    return torch.tensor(worker_ids), torch.stack(samples)
+
+
 class TestIndividualWorkerQueue(TestCase):
     def setUp(self):
-        self.dataset = TestWorkerQueueDataset([i for i in range(128)])
+        self.dataset = TestWorkerQueueDataset(torch.arange(128))
 
-    def _run_ind_worker_queue_test(self, batch_size, num_workers):
+    def _run_ind_worker_queue_test(self, batch_size, num_workers, dataset=None,
+                                   collate_fn=collate_worker_queue_batch):
+        if dataset is None:
+            dataset = self.dataset
         loader = DataLoader(
-            self.dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers,
-            worker_init_fn=self.dataset.worker_init_fn
+            dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers,
+            collate_fn=collate_fn, worker_init_fn=dataset.worker_init_fn
         )
         current_worker_idx = 0
         for i, (worker_ids, sample) in enumerate(loader):
-            self.assertEqual(worker_ids.tolist(), [current_worker_idx] * batch_size)
-            self.assertEqual(sample.tolist(), [j for j in range(i * batch_size, (i + 1) * batch_size)])
+            self.assertEqual(worker_ids, torch.full((batch_size,), current_worker_idx, dtype=torch.long))
+            self.assertEqual(sample, torch.arange(i * batch_size, (i + 1) * batch_size))
             current_worker_idx += 1
             if current_worker_idx == num_workers:
                 current_worker_idx = 0
 
     def test_ind_worker_queue(self):
+        # Round-robin over workers does not depend on the core count, so at
+        # least 3 workers are always tested; beyond that, more workers than
+        # cores would only oversubscribe small machines.
+        max_num_workers = max(3, min(5, mp.cpu_count()))
         for batch_size in (8, 16, 32, 64):
-            for num_workers in range(1, 6):
+            for num_workers in range(1, max_num_workers + 1):
                 self._run_ind_worker_queue_test(batch_size=batch_size, num_workers=num_workers)
 
+    def test_ind_worker_queue_getitems(self):
+        dataset = BatchedWorkerQueueDataset(torch.arange(128))
+        for num_workers in (1, 3):
+            self._run_ind_worker_queue_test(batch_size=16, num_workers=num_workers,
+                                            dataset=dataset, collate_fn=collate_identity)
+
 
 if __name__ == '__main__':
     run_tests()
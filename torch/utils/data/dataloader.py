@@ -93,6 +93,14 @@ else:
             return not self.manager_dead
 
 
+def _fetch_samples(dataset, indices):
+    r"""Fetches the samples of one batch from ``dataset``, in a single call to
+    its ``__getitems__`` if it has one, otherwise item by item."""
+    if hasattr(dataset, '__getitems__'):
+        return dataset.__getitems__(indices)
+    return [dataset[i] for i in indices]
+
+
 def _worker_loop(dataset, index_queue, data_queue, done_event, collate_fn, seed, init_fn, worker_id):
     # See NOTE [ Data Loader Multiprocessing Shutdown Logic ] for details on the
     # logic of this function.
@@ -134,7 +142,7 @@ def _worker_loop(dataset, index_queue, data_queue, done_event, collate_fn, seed,
                 continue
             idx, batch_indices = r
             try:
-                samples = collate_fn([dataset[i] for i in batch_indices])
+                samples = collate_fn(_fetch_samples(dataset, batch_indices))
             except Exception:
                 # It is important that we don't store exc_info in a variable,
                 # see NOTE [ Python Traceback Reference Cycle Problem ]
@@ -242,6 +250,8 @@ def pin_memory_batch(batch):
         return {k: pin_memory_batch(sample) for k, sample in batch.items()}
     elif isinstance(batch, container_abcs.Sequence):
         return [pin_memory_batch(sample) for sample in batch]
+    elif hasattr(batch, "pin_memory"):
+        return batch.pin_memory()
     else:
         return batch
 
@@ -579,7 +589,7 @@ class _DataLoaderIter(object):
     def __next__(self):
         if self.num_workers == 0:  # same-process loading
             indices = next(self.sample_iter)  # may raise StopIteration
-            batch = self.collate_fn([self.dataset[i] for i in indices])
+            batch = self.collate_fn(_fetch_samples(self.dataset, indices))
             if self.pin_memory:
                 batch = pin_memory_batch(batch)
             return batch
@@ -700,8 +710,12 @@ class DataLoader(object):
             loading. 0 means that the data will be loaded in the main process.
             (default: ``0``)
         collate_fn (callable, optional): merges a list of samples to form a mini-batch.
+            If the dataset defines ``__getitems__``, its result for the indices
+            of the batch is passed instead.
         pin_memory (bool, optional): If ``True``, the data loader will copy tensors
-            into CUDA pinned memory before returning them.
+            into CUDA pinned memory before returning them. Batches (or elements
+            of them) of a custom type are pinned by calling their
+            ``pin_memory()`` method, if they define one.
         drop_last (bool, optional): set to ``True`` to drop the last incomplete batch,
             if the dataset size is not divisible by the batch size. If ``False`` and
             the size of dataset is not divisible by the batch size, then the last batch
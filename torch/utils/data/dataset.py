@@ -11,6 +11,8 @@ class Dataset(object):
     All other datasets should subclass it. All subclasses should override
     ``__len__``, that provides the size of the dataset, and ``__getitem__``,
     supporting integer indexing in range from 0 to len(self) exclusive.
+    Subclasses can also implement ``__getitems__``, which takes the list of
+    indices of a batch and returns its samples, to speed up batched loading.
     """
 
     def __getitem__(self, index):